@@ -1,19 +1,39 @@
 import os
 import json
+import mimetypes
+import hashlib
+import hmac
 import joblib
-import pandas as pd
+import numpy as np
 import datetime
 import re
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session, send_from_directory
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import redis
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from flask import Flask, Response, abort, request, jsonify, render_template, redirect, url_for, session, g, send_from_directory
+from flask_compress import Compress
 from flask_cors import CORS
+from flask_session import Session
 from flask_sqlalchemy import SQLAlchemy
-from sklearn.impute import SimpleImputer
+from sqlalchemy import case, cast, func, insert, literal, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 
 app = Flask(__name__)
 # In production, change this key!
 app.secret_key = os.environ.get('SECRET_KEY', 'your_secure_random_key_here')
 CORS(app)
+# Brotli (or gzip for older clients) on HTML/JSON responses
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+Compress(app)
 
 # --- DATABASE CONFIG ---
 # Automatically switches between Render (Postgres) and Local (SQLite)
@@ -21,14 +41,65 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:/
 if app.config['SQLALCHEMY_DATABASE_URI'].startswith("postgres://"):
     app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace("postgres://", "postgresql://", 1)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Keep warm, health-checked connections to Postgres (works in front of PgBouncer in transaction mode too)
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith("postgresql"):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_pre_ping': True,
+        'pool_recycle': 1800
+    }
 db = SQLAlchemy(app)
 
+# --- SESSION CONFIG ---
+# Server-side sessions in Redis when REDIS_URL is set (Render), signed cookies otherwise (Local)
+REDIS_URL = os.environ.get('REDIS_URL')
+redis_client = redis.Redis.from_url(REDIS_URL) if REDIS_URL else None
+if redis_client:
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = redis_client
+    # Same lifetime as the cookie sessions: the cookie ends with the browser, and Redis drops
+    # abandoned sessions after a working shift
+    app.config['SESSION_PERMANENT'] = False
+    app.config['PERMANENT_SESSION_LIFETIME'] = datetime.timedelta(hours=8)
+    Session(app)
+
 # --- CONFIG ---
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 32)) * 1024 * 1024
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Let the front-end server send uploaded files instead of a worker. Behind nginx, set X_ACCEL_PREFIX
+# (e.g. /_protected/uploads/) to an `internal;` location aliased to UPLOAD_FOLDER; USE_X_SENDFILE=1
+# does the same for Apache/lighttpd. Without either, files are served from Python.
+X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX')
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+
+# --- PASSWORD HASHING ---
+# Argon2id via argon2-cffi (C implementation). Accounts created before hashing was introduced
+# still hold plaintext; those are compared in constant time and upgraded on their next login.
+password_hasher = PasswordHasher()
+# Unknown usernames and plaintext rows are verified against this hash as well, so every login attempt
+# pays for exactly one Argon2 check and response time doesn't reveal which usernames exist.
+DUMMY_PASSWORD_HASH = password_hasher.hash('timing-equalizer')
+
+def verify_password(stored, password):
+    password = password or ''
+    is_hash = bool(stored) and stored.startswith('$argon2')
+    try:
+        matched = password_hasher.verify(stored if is_hash else DUMMY_PASSWORD_HASH, password)
+    except (VerificationError, InvalidHashError):
+        matched = False
+    if is_hash:
+        return matched and bool(password)
+    return bool(stored) and bool(password) and hmac.compare_digest(stored.encode(), password.encode())
+
+def needs_rehash(stored):
+    return not stored.startswith('$argon2') or password_hasher.check_needs_rehash(stored)
+
 # --- DATABASE MODELS ---
 class User(db.Model):
     id = db.Column(db.String(50), primary_key=True)  # Username/PatientID
@@ -50,36 +121,94 @@ with app.app_context():
     db.create_all()
     # Create Admin/Doctor accounts if they don't exist
     if not User.query.get('admin1'):
-        db.session.add(User(id='admin1', password='Admin@123', role='admin', name='System Administrator'))
-        db.session.add(User(id='doctor1', password='Doctor@123', role='doctor', name='Dr. Saravana Kumar'))
-        db.session.add(User(id='rad1', password='Rad@123', role='radiologist', name='Chief Radiologist'))
-        db.session.commit()
-        print("✓ System initialized with default Admin/Doctor accounts.")
+        db.session.add(User(id='admin1', password=password_hasher.hash('Admin@123'), role='admin', name='System Administrator'))
+        db.session.add(User(id='doctor1', password=password_hasher.hash('Doctor@123'), role='doctor', name='Dr. Saravana Kumar'))
+        db.session.add(User(id='rad1', password=password_hasher.hash('Rad@123'), role='radiologist', name='Chief Radiologist'))
+        try:
+            db.session.commit()
+            print("✓ System initialized with default Admin/Doctor accounts.")
+        except IntegrityError:
+            # Another gunicorn worker seeded the accounts first
+            db.session.rollback()
+
+# --- USER CACHE ---
+# Login reads (password, role, name) for a row that almost never changes; keep it in Redis briefly.
+USER_CACHE_TTL = 300
+
+def get_user_cached(uid):
+    if not uid:
+        return None
+    if redis_client:
+        cached = redis_client.get(f"u:{uid}")
+        if cached:
+            return json.loads(cached)
+    user = User.query.get(uid)
+    if not user:
+        return None
+    record = {'id': user.id, 'password': user.password, 'role': user.role, 'name': user.name}
+    if redis_client:
+        redis_client.setex(f"u:{uid}", USER_CACHE_TTL, json.dumps(record))
+    return record
+
+# --- JSON ARRAY APPEND ---
+# notes/images hold JSON arrays as TEXT. Appending splices the new item in with a single UPDATE,
+# so the row is never read back, re-parsed and rewritten from Python (and concurrent appends don't clobber each other).
+def append_json_item(column, pid, item):
+    encoded = json.dumps(item)
+    appended = case(
+        (column == '[]', literal(f"[{encoded}]")),
+        else_=func.substr(column, 1, func.length(column) - 1, type_=db.Text) + f", {encoded}]"
+    )
+    result = db.session.execute(update(PatientData).where(PatientData.id == pid).values({column.key: appended}))
+    db.session.commit()
+    return result.rowcount > 0
+
+# Primary-key lookup of the id alone, without loading the notes/images blobs
+def patient_exists(pid):
+    return db.session.query(PatientData.id).filter(PatientData.id == pid).first() is not None
+
+# Counts array items in SQL. Postgres needs the TEXT cast to JSON first; SQLite reads TEXT as-is.
+def json_array_length(column):
+    return func.json_array_length(cast(column, db.JSON().with_variant(db.Text(), 'sqlite')))
 
 # --- VALIDATION LOGIC ---
+NAME_RE = re.compile(r"^[A-Za-z\s]+$")
+ID_RE = re.compile(r"^[A-Za-z0-9]+$")
+UPPER_RE = re.compile(r"[A-Z]")
+DIGIT_RE = re.compile(r"\d")
+SPECIAL_RE = re.compile(r"[!@#$%^&*(),.?\":{}|<>]")
+
 def validate_registration(data):
     # 1. Name: Only Alphabets and spaces
-    if not re.match(r"^[A-Za-z\s]+$", data.get('name', '')):
+    if not NAME_RE.match(data.get('name', '')):
         return False, "Name must contain only alphabets."
     
     # 2. Patient ID: Alphabets and Numbers only
-    if not re.match(r"^[A-Za-z0-9]+$", data.get('patient_id', '')):
+    if not ID_RE.match(data.get('patient_id', '')):
         return False, "Patient ID must contain only letters and numbers."
     
     # 3. Password: Min 8, Max 16, 1 Upper, 1 Number, 1 Special Char
     pwd = data.get('password', '')
     if len(pwd) < 8 or len(pwd) > 16:
         return False, "Password must be 8-16 characters long."
-    if not re.search(r"[A-Z]", pwd):
+    if not UPPER_RE.search(pwd):
         return False, "Password must contain at least one capital letter."
-    if not re.search(r"\d", pwd):
+    if not DIGIT_RE.search(pwd):
         return False, "Password must contain at least one number."
-    if not re.search(r"[!@#$%^&*(),.?\":{}|<>]", pwd):
+    if not SPECIAL_RE.search(pwd):
         return False, "Password must contain at least one special character."
         
     return True, "Valid"
 
 # --- ML LOADING ---
+# Intel's scikit-learn extension (scikit-learn-intelex), if installed, routes supported estimators to oneDAL.
+# Must run before the model is unpickled.
+try:
+    from sklearnex import patch_sklearn
+    patch_sklearn()
+except ImportError:
+    pass
+
 try:
     model = joblib.load('model_assets/cervical_cancer_model.pkl')
     scaler = joblib.load('model_assets/scaler.pkl')
@@ -90,8 +219,128 @@ except:
     MODEL_LOADED = False
     feature_names = ['Age', 'Smokes (years)', 'Hormonal Contraceptives (years)', 'IUD (years)', 'STDs (number)']
 
+# Missing (NaN) inputs are filled with training-set means. The preferred source is the imputer fit
+# during training, saved alongside the other assets with joblib.dump(imputer, 'model_assets/imputer.pkl').
+# Without it, the scaler's fitted means (StandardScaler.mean_) are used; with neither, NaN is rejected.
+try:
+    imputer = joblib.load('model_assets/imputer.pkl')
+except:
+    imputer = None
+fill_means = getattr(scaler, 'mean_', None) if MODEL_LOADED and imputer is None else None
+
+# Optional ONNX export of scaler + selection + model (see export_onnx.py), run in one onnxruntime call.
+# onnxruntime is only imported when the export exists, so workers without it don't pay for the module.
+onnx_session = None
+if os.path.exists('model_assets/model.onnx'):
+    try:
+        import onnxruntime as ort
+        onnx_session = ort.InferenceSession('model_assets/model.onnx', providers=['CPUExecutionProvider'])
+    except:
+        onnx_session = None
+
+# The ONNX graph runs in float32; inf, larger magnitudes and (when nothing can impute it) NaN are
+# rejected up front so the ONNX and scikit-learn paths accept exactly the same inputs
+FEATURE_MAX = float(np.finfo(np.float32).max)
+
+def predict_batch(X):
+    if onnx_session is not None:
+        labels, probs = onnx_session.run(None, {'X': X.astype(np.float32)})
+        return labels, probs[:, 1]
+    X_selected = scaler.transform(X)[:, selected_features]
+    return model.predict(X_selected), model.predict_proba(X_selected)[:, 1]
+
+# --- PREDICTION BATCHING ---
+# At batch size 1 the model call is mostly per-call overhead. Concurrent /predict requests queue their
+# row and wait; a background thread stacks whatever arrives within PREDICT_BATCH_WAIT_MS (up to
+# PREDICT_BATCH_SIZE rows) and runs the model once for all of them.
+PREDICT_BATCH_SIZE = int(os.environ.get('PREDICT_BATCH_SIZE', 32))
+PREDICT_BATCH_WAIT_MS = float(os.environ.get('PREDICT_BATCH_WAIT_MS', 5))
+PREDICT_TIMEOUT_S = float(os.environ.get('PREDICT_TIMEOUT_S', 10))
+
+class PredictionBatcher:
+    def __init__(self, max_batch, max_wait):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, row):
+        # Started on first use so the thread lives in the worker process, not a pre-fork parent
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        future = Future()
+        self.queue.put((row, future))
+        try:
+            return future.result(timeout=PREDICT_TIMEOUT_S)
+        except FutureTimeoutError:
+            future.cancel()
+            raise RuntimeError("Prediction timed out")
+
+    def _run(self):
+        # Never lets an exception escape: a dead thread would leave every later /predict waiting
+        while True:
+            pending = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._resolve(pending)
+            except Exception as e:
+                app.logger.exception("Prediction batch failed")
+                for _, future in pending:
+                    settle(future, error=e)
+
+    def _resolve(self, pending):
+        try:
+            labels, probs = predict_batch(np.vstack([row for row, _ in pending]))
+        except Exception as e:
+            if len(pending) == 1:
+                settle(pending[0][1], error=e)
+                return
+            # One bad row fails the whole stacked call; rerun rows one by one so only its caller gets the error
+            for item in pending:
+                self._resolve([item])
+            return
+        for i, (_, future) in enumerate(pending):
+            settle(future, result=(int(labels[i]), float(probs[i])))
+
+def settle(future, result=None, error=None):
+    if future.done():
+        return
+    try:
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+    except InvalidStateError:
+        pass  # cancelled by a caller that timed out in the meantime
+
+batcher = PredictionBatcher(PREDICT_BATCH_SIZE, PREDICT_BATCH_WAIT_MS / 1000)
+
+def run_model(arr):
+    return batcher.submit(arr[0])
+
+# Identical feature vectors (re-submissions) skip the model; the TTL bounds staleness after a retrain
+PREDICTION_CACHE_TTL = 3600
+
 # --- ROUTES ---
 
+@app.before_request
+def load_session_user():
+    # Read the session once per request; routes check g.user/g.role instead of the session
+    g.user = session.get('user')
+    g.role = session.get('role')
+    g.name = session.get('name')
+
 @app.route('/')
 def login_page():
     return render_template('login.html')
@@ -100,39 +349,70 @@ def login_page():
 def login():
     username = request.form.get('username')
     password = request.form.get('password')
-    user = User.query.get(username)
+    user = get_user_cached(username)
 
-    if user and user.password == password:
-        session['user'] = user.id
-        session['role'] = user.role
-        session['name'] = user.name
+    if verify_password(user['password'] if user else None, password):
+        if needs_rehash(user['password']):
+            User.query.filter_by(id=user['id']).update({'password': password_hasher.hash(password)})
+            db.session.commit()
+            if redis_client:
+                redis_client.delete(f"u:{user['id']}")
+        if redis_client:
+            # New session id on login, so a session id planted before login can't be reused (fixation)
+            app.session_interface.regenerate(session)
+        session.clear()
+        session['user'] = user['id']
+        session['role'] = user['role']
+        session['name'] = user['name']
         return redirect(url_for('dashboard'))
     else:
         return render_template('login.html', error="Invalid Credentials")
 
+DASHBOARD_PAGE_SIZE = 100
+
 @app.route('/dashboard')
 def dashboard():
-    if 'user' not in session: return redirect(url_for('login_page'))
+    if not g.user: return redirect(url_for('login_page'))
     
-    if session['role'] == 'patient':
-        records = PatientData.query.filter_by(id=session['user']).all()
-    else:
-        records = PatientData.query.all()
+    # List view only needs these columns plus counts; notes/images are fetched per patient via /patient/<pid>/details
+    query = db.session.query(
+        PatientData.id, PatientData.name, PatientData.age, PatientData.risk_status,
+        json_array_length(PatientData.notes).label('n_notes'),
+        json_array_length(PatientData.images).label('n_images')
+    )
+    if g.role == 'patient':
+        query = query.filter(PatientData.id == g.user)
+
+    # Keyset pagination on the primary key: each page is an index range scan, never a full-table read
+    after = request.args.get('after')
+    if after:
+        query = query.filter(PatientData.id > after)
+    rows = query.order_by(PatientData.id).limit(DASHBOARD_PAGE_SIZE + 1).all()
+    next_after = rows[DASHBOARD_PAGE_SIZE - 1].id if len(rows) > DASHBOARD_PAGE_SIZE else None
     
     patients_dict = {}
-    for p in records:
+    for p in rows[:DASHBOARD_PAGE_SIZE]:
         patients_dict[p.id] = {
             'name': p.name,
             'age': p.age,
             'risk_status': p.risk_status,
-            'notes': json.loads(p.notes),
-            'images': json.loads(p.images)
+            'n_notes': p.n_notes,
+            'n_images': p.n_images
         }
-    return render_template('dashboard.html', user=session, patients=patients_dict)
+    return render_template('dashboard.html', user=g, patients=patients_dict, after=after, next_after=next_after)
+
+@app.route('/patient/<pid>/details')
+def patient_details(pid):
+    if not g.user or (g.role == 'patient' and g.user != pid):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'})
+    record = db.session.query(PatientData.notes, PatientData.images).filter(PatientData.id == pid).first()
+    if not record:
+        return jsonify({'status': 'error', 'message': 'Patient not found'})
+    return jsonify({'status': 'success', 'notes': json.loads(record.notes), 'images': json.loads(record.images)})
 
 @app.route('/create_patient', methods=['POST'])
 def create_patient():
-    if session.get('role') not in ['admin', 'doctor']:
+    if g.role not in ['admin', 'doctor']:
         return jsonify({'status': 'error', 'message': 'Unauthorized'})
 
     data = request.get_json()
@@ -143,19 +423,20 @@ def create_patient():
         return jsonify({'status': 'error', 'message': error_msg})
     
     new_id = data.get('patient_id')
-    if User.query.get(new_id):
-        return jsonify({'status': 'error', 'message': 'Patient ID already exists'})
 
-    # Create User & Patient Record
+    # Create User & Patient Record (Core INSERTs, one transaction; a duplicate ID fails on the primary key)
     try:
-        new_user = User(id=new_id, password=data.get('password'), role='patient', name=data.get('name'))
-        new_patient = PatientData(id=new_id, name=data.get('name'), age=data.get('age'))
-        
-        db.session.add(new_user)
-        db.session.add(new_patient)
+        db.session.execute(insert(User).values(id=new_id, password=password_hasher.hash(data.get('password')), role='patient', name=data.get('name')))
+        db.session.execute(insert(PatientData).values(id=new_id, name=data.get('name'), age=data.get('age')))
         db.session.commit()
+        if redis_client:
+            redis_client.delete(f"u:{new_id}")
         return jsonify({'status': 'success', 'message': 'Patient Profile Created Successfully'})
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': 'Patient ID already exists'})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'status': 'error', 'message': str(e)})
 
 @app.route('/predict', methods=['POST'])
@@ -163,21 +444,31 @@ def predict():
     try:
         data = request.get_json()
         pid = data.get('patient_id_context')
-        
-        input_data = {}
-        for feat in feature_names:
-            val = data.get(feat, 0.0)
-            try: input_data[feat] = float(val)
-            except: input_data[feat] = 0.0
-            
+
         if MODEL_LOADED:
-            df = pd.DataFrame([input_data])
-            imputer = SimpleImputer(strategy='mean')
-            df_imputed = pd.DataFrame(imputer.fit_transform(df), columns=feature_names)
-            df_scaled = scaler.transform(df_imputed)
-            df_selected = df_scaled[:, selected_features]
-            prediction = int(model.predict(df_selected)[0])
-            prob = float(model.predict_proba(df_selected)[0][1])
+            # Parse straight into the (1, n_features) row the pipeline consumes
+            arr = np.empty((1, len(feature_names)), dtype=np.float64)
+            for i, feat in enumerate(feature_names):
+                try: arr[0, i] = float(data.get(feat, 0.0))
+                except: arr[0, i] = 0.0
+            # NaN is accepted as "missing" only when there are training means to fill it with
+            invalid = np.abs(arr) > FEATURE_MAX
+            if imputer is None and fill_means is None:
+                invalid |= ~np.isfinite(arr)
+            if invalid.any():
+                return jsonify({'status': 'error', 'message': 'Feature values must be finite numbers.'})
+            if imputer is not None:
+                arr = imputer.transform(arr)
+            elif fill_means is not None:
+                arr = np.where(np.isnan(arr), fill_means, arr)
+            key = "pred:" + hashlib.blake2b(arr.tobytes(), digest_size=16).hexdigest()
+            cached = redis_client.get(key) if redis_client else None
+            if cached:
+                prediction, prob = json.loads(cached)
+            else:
+                prediction, prob = run_model(arr)
+                if redis_client:
+                    redis_client.setex(key, PREDICTION_CACHE_TTL, json.dumps([prediction, prob]))
         else:
             # Fallback for UI testing
             prob = 0.85
@@ -198,37 +489,97 @@ def predict():
 # --- NOTES & UPLOADS (Keep existing logic) ---
 @app.route('/add_note', methods=['POST'])
 def add_note():
-    if session.get('role') != 'doctor': return jsonify({'status': 'error'})
+    if g.role != 'doctor': return jsonify({'status': 'error'})
     data = request.get_json()
-    patient = PatientData.query.get(data.get('patient_id'))
-    if patient:
-        notes = json.loads(patient.notes)
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-        notes.append(f"[{ts}] {session['name']}: {data.get('note')}")
-        patient.notes = json.dumps(notes)
-        db.session.commit()
+    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    if append_json_item(PatientData.notes, data.get('patient_id'), f"[{ts}] {g.name}: {data.get('note')}"):
         return jsonify({'status': 'success'})
     return jsonify({'status': 'error'})
 
+# Multipart uploads are written to disk and recorded on a small thread pool, so the worker can return
+# as soon as the body has been received instead of waiting on the disk write and the UPDATE.
+# Under gunicorn's gevent worker the stdlib pool would only run greenlets on the same OS thread,
+# so gevent's executor (real native threads) is used there instead.
+if 'gevent.monkey' in sys.modules and sys.modules['gevent.monkey'].is_module_patched('threading'):
+    from gevent.threadpool import ThreadPoolExecutor as UploadExecutor
+else:
+    UploadExecutor = ThreadPoolExecutor
+upload_executor = UploadExecutor(max_workers=int(os.environ.get('UPLOAD_WORKERS', 4)))
+
+# Each queued job holds its upload in memory; past this many, uploads are written inline instead
+UPLOAD_MAX_PENDING = int(os.environ.get('UPLOAD_MAX_PENDING', 8))
+pending_uploads = set()
+pending_uploads_lock = threading.Lock()
+
+def save_upload(data, path, pid, filename):
+    with open(path, 'wb') as f:
+        f.write(data)
+    if not append_json_item(PatientData.images, pid, filename):
+        os.remove(path)
+        return False
+    return True
+
+def save_upload_in_background(data, path, pid, filename):
+    try:
+        with app.app_context():
+            save_upload(data, path, pid, filename)
+    except Exception:
+        app.logger.exception("Failed to store upload %s", filename)
+
+def queue_upload(*args):
+    with pending_uploads_lock:
+        pending_uploads.difference_update([f for f in pending_uploads if f.done()])
+        if len(pending_uploads) >= UPLOAD_MAX_PENDING:
+            return False
+        pending_uploads.add(upload_executor.submit(save_upload_in_background, *args))
+        return True
+
 @app.route('/upload_biopsy', methods=['POST'])
 def upload_biopsy():
-    if session.get('role') != 'radiologist': return jsonify({'status': 'error'})
+    if g.role != 'radiologist': return jsonify({'status': 'error'})
     file = request.files.get('file')
     pid = request.form.get('patient_id')
-    if file and '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS:
+    if file and '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS and patient_exists(pid):
         filename = secure_filename(f"{pid}_{file.filename}")
-        file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-        patient = PatientData.query.get(pid)
-        if patient:
-            imgs = json.loads(patient.images)
-            imgs.append(filename)
-            patient.images = json.dumps(imgs)
-            db.session.commit()
+        path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        data = file.stream.read()
+        if queue_upload(data, path, pid, filename):
+            return jsonify({'status': 'accepted'}), 202
+        if save_upload(data, path, pid, filename):
+            return jsonify({'status': 'success'})
+    return jsonify({'status': 'error'})
+
+# Raw-body upload: the client PUTs the file bytes with the filename in the URL, and the body is
+# copied to disk in 1 MB chunks without going through Werkzeug's multipart parser. The body goes to a
+# temp file first and is moved into place only once complete, so an aborted upload never leaves a
+# truncated file under the final name.
+@app.route('/upload_biopsy/<pid>/<filename>', methods=['PUT'])
+def upload_biopsy_stream(pid, filename):
+    if g.role != 'radiologist': return jsonify({'status': 'error'})
+    if '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS and patient_exists(pid):
+        filename = secure_filename(f"{pid}_{filename}")
+        fd, tmp_path = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(request.stream, f, length=UPLOAD_CHUNK_SIZE)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates 0600; the front-end server must be able to read it
+            os.replace(tmp_path, os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        if append_json_item(PatientData.images, pid, filename):
             return jsonify({'status': 'success'})
     return jsonify({'status': 'error'})
 
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
+    if X_ACCEL_PREFIX:
+        path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX.rstrip('/') + '/' + filename
+        return response
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 @app.route('/logout')
@@ -238,4 +589,5 @@ def logout():
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG') == '1')
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""Exports the scaler + feature selection + model from model_assets/ as a single ONNX graph.
+
+Run once after retraining (skl2onnx is only needed here, not by the web app):
+    pip install skl2onnx
+    python export_onnx.py
+"""
+import copy
+import joblib
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+model = joblib.load('model_assets/cervical_cancer_model.pkl')
+scaler = joblib.load('model_assets/scaler.pkl')
+selected_features = joblib.load('model_assets/selected_features.pkl')
+feature_names = joblib.load('model_assets/feature_names.pkl')
+
+n_features = len(feature_names)
+# skl2onnx wants plain int column indices (selected_features may be a mask or numpy ints)
+columns = [int(i) for i in np.arange(n_features)[selected_features]]
+
+# /predict scales all features and then keeps the selected columns. The scaler works per column,
+# so selecting first and scaling with the matching slice of its fitted statistics gives the same result.
+selected_scaler = copy.deepcopy(scaler)
+for attr, value in vars(scaler).items():
+    if attr.endswith('_') and isinstance(value, np.ndarray) and value.shape == (n_features,):
+        setattr(selected_scaler, attr, value[columns])
+selected_scaler.n_features_in_ = len(columns)
+
+selector = ColumnTransformer([('selected', 'passthrough', columns)]).fit(np.zeros((1, n_features)))
+pipeline = Pipeline([('select', selector), ('scaler', selected_scaler), ('model', model)])
+
+onx = convert_sklearn(
+    pipeline,
+    initial_types=[('X', FloatTensorType([None, n_features]))],
+    options={id(model): {'zipmap': False}}  # probabilities as a plain (n, 2) array
+)
+with open('model_assets/model.onnx', 'wb') as f:
+    f.write(onx.SerializeToString())
+print("✓ Exported model_assets/model.onnx")
@@ -0,0 +1,17 @@
+# Gunicorn settings, loaded automatically from the working directory (see procfile)
+import os
+
+# Async workers so requests waiting on Postgres, Redis or disk don't hold a whole worker.
+# The gevent worker monkey-patches the stdlib itself before loading app.py.
+worker_class = 'gevent'
+# Kept small on purpose: every worker loads its own copy of the model and its own DB pool.
+# Postgres connection budget = workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) = 2 x (20 + 10) = 60 by
+# default, under Postgres' default max_connections=100. Raise WEB_CONCURRENCY only together with
+# smaller DB_POOL_SIZE/DB_MAX_OVERFLOW (or PgBouncer in front).
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_connections = 1000
+
+def post_fork(server, worker):
+    # psycopg2 is a C driver; this makes its socket waits yield to gevent instead of blocking the worker
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()